@@ -9,6 +9,7 @@ import uuid
 
 # Import your task
 from tasks import process_financial_report
+from fleet import record_arrival
 
 # Init FastAPI
 app = FastAPI()
@@ -40,6 +41,10 @@ async def analyze(query: str = Form(...), file: UploadFile = None):
 
     # Enqueue job
     job = queue.enqueue(process_financial_report, query, file_path, file_id)
+    try:
+        record_arrival(redis_conn, file_id)
+    except Exception as e:
+        print(f"⚠️ Failed to record arrival for job {file_id}: {e}")
     return {"job_id": job.id, "file_id": file_id, "status": "queued"}
 
 @app.get("/result/{job_id}")
@@ -0,0 +1,89 @@
+# bench_memory.py
+"""
+Peak RSS per job: legacy str pipeline vs. shared FinancialDocument handle.
+
+Each mode runs in a fresh subprocess so the peaks don't contaminate each other.
+
+Usage:
+    python bench_memory.py data/financial_report.pdf
+"""
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_strings(path: str) -> None:
+    """Replicates the old flow: full_report concat + per-tool join/split copies.
+
+    Uses the same PyMuPDF extractor as the document mode, so the difference
+    measured is the string copies, not the parser.
+    """
+    import fitz
+    from document import extract_page
+
+    pages = []
+    with fitz.open(path) as pdf:
+        for page in pdf:
+            pages.append(extract_page(page)[1])
+
+    full_report = ""
+    for content in pages:
+        content = content.strip()
+        while "\n\n" in content:
+            content = content.replace("\n\n", "\n")
+        full_report += content + "\n"
+
+    investment_data = " ".join(full_report.split())
+    risk_data = " ".join(full_report.split())
+    print(len(full_report), len(investment_data), len(risk_data))
+
+
+def run_document(path: str) -> None:
+    """New flow: one mapped extraction, tools read page views from it."""
+    from document import get_document
+
+    document = get_document(path)
+    llm_text = document.text()
+    print(len(llm_text), document.normalized_length(), document.normalized_length())
+
+
+def _run_mode(mode: str, path: str) -> float:
+    # Work on a private copy so the document mode always starts cold
+    workdir = tempfile.mkdtemp()
+    try:
+        pdf = shutil.copy(path, workdir)
+        output = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, pdf],
+            check=True, capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout
+        return float(output.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--mode":
+        {"strings": run_strings, "document": run_document}[sys.argv[2]](sys.argv[3])
+        print(_peak_rss_mb())
+        sys.exit(0)
+
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(1)
+
+    before = _run_mode("strings", sys.argv[1])
+    after = _run_mode("document", sys.argv[1])
+    print(f"📄 {sys.argv[1]}")
+    print(f"Peak RSS before (str copies):        {before:8.1f} MB")
+    print(f"Peak RSS after (FinancialDocument):  {after:8.1f} MB")
+    print(f"Saved:                               {before - after:8.1f} MB")
@@ -0,0 +1,115 @@
+# check_search_cache.py
+"""
+Offline self-check for search_cache.CachedSearchTool.
+
+Runs normalization, TTL expiry, in-worker and cross-worker coalescing, leader
+failure hand-over and the cache-outage fallback against LocalSearchCacheBackend
+with a fake search tool - no Redis or Serper key needed.
+
+Usage:
+    python check_search_cache.py
+"""
+from typing import Any
+import logging
+import threading
+import time
+
+from search_cache import CachedSearchTool, LocalSearchCacheBackend
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class _FakeSearch:
+    """Stands in for SerperDevTool: counts calls, optionally slow or failing."""
+
+    def __init__(self, delay: float = 0.0, fail_first: bool = False):
+        self.calls = 0
+        self.delay = delay
+        self.fail_first = fail_first
+        self._lock = threading.Lock()
+
+    def run(self, search_query: str) -> Any:
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        time.sleep(self.delay)
+        if self.fail_first and call == 1:
+            raise RuntimeError("upstream search failed")
+        return {"query": search_query, "call": call}
+
+
+class _BrokenBackend:
+    """Backend that fails every call, like Redis during an outage."""
+
+    def __getattr__(self, name):
+        def fail(*args):
+            raise ConnectionError("redis is down")
+        return fail
+
+
+def _run_concurrently(tools, query: str, count: int) -> list:
+    results, errors = [], []
+
+    def call(tool):
+        try:
+            results.append(tool.run(search_query=query))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call, args=(tools[i % len(tools)],)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results + errors
+
+
+def selftest_search_cache():
+    """Check normalization, TTL, coalescing and fallback against the local backend."""
+    # Normalized queries share one cache entry
+    search = _FakeSearch()
+    tool = CachedSearchTool(search_tool=search, backend=LocalSearchCacheBackend())
+    tool.run(search_query="Tesla Q2 2025 revenue?")
+    tool.run(search_query="  tesla   q2 2025 REVENUE ")
+    assert search.calls == 1, search.calls
+
+    # Entries expire after the TTL
+    search = _FakeSearch()
+    tool = CachedSearchTool(search_tool=search, backend=LocalSearchCacheBackend(), ttl=1)
+    tool.run(search_query="auto sector margins")
+    time.sleep(1.1)
+    tool.run(search_query="auto sector margins")
+    assert search.calls == 2, search.calls
+
+    # Concurrent identical searches: one call within a worker...
+    search = _FakeSearch(delay=0.3)
+    tool = CachedSearchTool(search_tool=search, backend=LocalSearchCacheBackend())
+    _run_concurrently([tool], "ev demand outlook", 8)
+    assert search.calls == 1, search.calls
+
+    # ...and across "workers" (separate tools) sharing one backend
+    search, backend = _FakeSearch(delay=0.3), LocalSearchCacheBackend()
+    workers = [CachedSearchTool(search_tool=search, backend=backend, poll_interval=0.05) for _ in range(3)]
+    _run_concurrently(workers, "lithium prices", 6)
+    assert search.calls == 1, search.calls
+
+    # A failed leader hands over immediately instead of after lock_timeout
+    search, backend = _FakeSearch(delay=0.2, fail_first=True), LocalSearchCacheBackend()
+    workers = [CachedSearchTool(search_tool=search, backend=backend, poll_interval=0.05) for _ in range(2)]
+    started = time.monotonic()
+    outcomes = _run_concurrently(workers, "battery supply chain", 2)
+    assert time.monotonic() - started < 5, "follower waited for the full lock timeout"
+    assert search.calls == 2 and any(isinstance(o, dict) for o in outcomes), outcomes
+
+    # A dead backend degrades to uncached search instead of failing
+    search = _FakeSearch()
+    tool = CachedSearchTool(search_tool=search, backend=_BrokenBackend())
+    assert tool.run(search_query="fed rate decision")["call"] == 1
+    assert tool.run(search_query="fed rate decision")["call"] == 2
+
+    logger.info("✅ Search cache self-check passed")
+
+
+if __name__ == "__main__":
+    selftest_search_cache()
@@ -0,0 +1,202 @@
+# compare.py
+"""
+Multi-document comparison: one metrics matrix, one LLM call.
+
+Each document's existing extraction is reused through `get_document`, the
+headline metrics for all documents are pulled out in a single vectorized
+pandas pass, derived ratios and period-over-period changes are computed with
+numpy, and the resulting table (not the full reports) is sent to the LLM once
+for comparative commentary.
+"""
+from datetime import datetime
+from typing import List
+from redis import Redis
+import json
+import logging
+import os
+import re
+import traceback
+
+import numpy as np
+import pandas as pd
+
+from document import get_document, release_document
+
+logger = logging.getLogger(__name__)
+
+redis_conn = Redis(
+    host=os.getenv("REDIS_HOST", "localhost"),
+    port=int(os.getenv("REDIS_PORT", 6379)),
+    db=int(os.getenv("REDIS_DB", 0))
+)
+
+# Label -> first figure following it on the same line, e.g. "Total revenues  $ (1,234.5)"
+# (skipping column-header years such as "2024" and percentages such as "12%").
+# This is a heuristic: str.extract takes the first match anywhere in the report.
+_NUMBER = r"[^\d\n]{0,60}?(?!(?:19|20)\d\d\b)(\(?-?\d[\d,]*(?:\.\d+)?\)?)(?![\d,.]*\s*%)"
+_NOT_PER_SHARE = r"(?![^\d\n]*per\s+(?:common\s+)?share)"
+METRIC_PATTERNS = {
+    "revenue": r"total\s+revenues?" + _NUMBER,
+    "gross_profit": r"(?:total\s+)?gross\s+profit" + _NUMBER,
+    "operating_income": r"(?:(?:income|income\s+\(loss\))\s+from\s+operations|operating\s+income)" + _NUMBER,
+    # Combined into operating_income with a negative sign, then dropped
+    "operating_loss": r"(?<!\()(?:loss\s+from\s+operations|operating\s+loss)" + _NUMBER,
+    "net_income": (
+        r"net\s+income(?:\s+attributable\s+to\s+common\s+stockholders)?" + _NOT_PER_SHARE + _NUMBER
+    ),
+    # Combined into net_income with a negative sign, then dropped
+    "net_loss": (
+        r"(?<!\()net\s+loss(?:\s+attributable\s+to\s+common\s+stockholders)?" + _NOT_PER_SHARE + _NUMBER
+    ),
+    "total_assets": r"total\s+assets" + _NUMBER,
+    "total_liabilities": (
+        r"total\s+liabilities(?!\s+and\s+(?:(?:stockholders|shareholders)['’]?\s+)?equity)" + _NUMBER
+    ),
+    "cash": r"cash\s+and\s+cash\s+equivalents" + _NUMBER,
+    "operating_cash_flow": r"net\s+cash\s+provided\s+by\s+operating\s+activities" + _NUMBER,
+}
+
+# Derived ratio columns: compared by difference (percentage points), not % change
+RATIO_COLUMNS = ["gross_margin", "operating_margin", "net_margin", "debt_to_assets"]
+
+
+# ------------------------------
+# Metrics Matrix
+# ------------------------------
+def _to_number(raw: pd.Series) -> pd.Series:
+    """'(1,234.5)' -> -1234.5; unmatched cells stay NaN."""
+    negative = raw.str.startswith("(", na=False)
+    values = pd.to_numeric(raw.str.replace(r"[(),$\s]", "", regex=True), errors="coerce")
+    return values.where(~negative, -values)
+
+
+def build_metrics_matrix(texts: pd.Series) -> pd.DataFrame:
+    """Documents x metrics matrix; `texts` is indexed by document label."""
+    matrix = pd.DataFrame(
+        {
+            metric: _to_number(texts.str.extract(pattern, flags=re.IGNORECASE, expand=False))
+            for metric, pattern in METRIC_PATTERNS.items()
+        },
+        index=texts.index,
+    )
+
+    # "Loss from operations" / "Net loss" lines are reported unsigned (or in
+    # parentheses); either way they are a negative income
+    for income, loss in (("operating_income", "operating_loss"), ("net_income", "net_loss")):
+        matrix[income] = matrix[income].fillna(-matrix.pop(loss).abs())
+
+    # Ratios computed column-wise across every document at once
+    with np.errstate(divide="ignore", invalid="ignore"):
+        revenue = matrix["revenue"].to_numpy(dtype=float)
+        matrix["gross_margin"] = matrix["gross_profit"].to_numpy(dtype=float) / revenue
+        matrix["operating_margin"] = matrix["operating_income"].to_numpy(dtype=float) / revenue
+        matrix["net_margin"] = matrix["net_income"].to_numpy(dtype=float) / revenue
+        matrix["debt_to_assets"] = (
+            matrix["total_liabilities"].to_numpy(dtype=float) / matrix["total_assets"].to_numpy(dtype=float)
+        )
+    return matrix.replace([np.inf, -np.inf], np.nan)
+
+
+def compute_changes(matrix: pd.DataFrame) -> pd.DataFrame:
+    """Change of each document versus the previous one.
+
+    Money columns (`<metric>_pct`): percent change relative to the magnitude of
+    the previous value, so the sign always follows the direction of travel
+    (a loss of -50 turning into a profit of 80 is +260%, not -260%).
+    Ratio columns (`<ratio>_pp`): difference in percentage points.
+    """
+    money = matrix.drop(columns=RATIO_COLUMNS)
+    previous = money.shift(1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = (money - previous) / previous.abs() * 100
+    pct = pct.where(previous != 0)
+    points = matrix[RATIO_COLUMNS].diff() * 100
+
+    changes = pd.concat([pct.add_suffix("_pct"), points.add_suffix("_pp")], axis=1)
+    return changes.replace([np.inf, -np.inf], np.nan).iloc[1:]
+
+
+def _json_table(frame: pd.DataFrame) -> dict:
+    """DataFrame -> {row: {column: value}} with NaN as null."""
+    return json.loads(frame.round(4).to_json(orient="index"))
+
+
+# ------------------------------
+# Comparative Commentary
+# ------------------------------
+def build_comparison_prompt(query: str, matrix: pd.DataFrame, changes: pd.DataFrame) -> str:
+    return f"""You are a senior financial analyst. The user asked: "{query}"
+
+Below are key metrics extracted from {len(matrix)} financial documents, in the order provided \
+(e.g. consecutive quarters or peer companies). Values were pulled out of the text by heuristic \
+pattern matching, not read from structured statements: a figure may be missing, mis-scaled or \
+taken from the wrong line, so flag any value that looks implausible rather than relying on it. \
+Ratios are fractions; NaN means the metric was not found in that document.
+
+Metrics:
+{matrix.to_string(float_format=lambda v: f"{v:,.4g}")}
+
+Change versus the previous document. Columns ending in _pct are percent changes measured against \
+the size of the previous value, so a positive number always means the figure went up (e.g. a loss \
+shrinking or turning into a profit is positive). Columns ending in _pp are ratio differences in \
+percentage points. NaN means either value is missing or the previous value was zero.
+{changes.to_string(float_format=lambda v: f"{v:+.1f}")}
+
+Write a concise comparative analysis:
+1. Compare revenue, profitability and margins across the documents.
+2. Compare balance sheet strength and cash generation.
+3. Call out the most significant improvements and deteriorations.
+4. Note any metrics that are missing or look implausible and could change the conclusion.
+Base every statement on the figures above. This is not financial advice."""
+
+
+def process_comparison(query: str, file_hashes: List[str], file_paths: List[str], compare_id: str):
+    """Compare several already-uploaded documents in one background job."""
+    redis_key = f"finance_result:{compare_id}"
+    try:
+        from agents import llm
+        from fleet import set_stage
+
+        logger.info(f"🔎 Starting comparison {compare_id} across {len(file_paths)} documents")
+        set_stage("metrics_extraction")
+
+        labels = []
+        for file_hash in file_hashes:
+            name = redis_conn.hget(f"finance_result:{file_hash}", "file_name")
+            # Hash prefix keeps labels unique when file names repeat
+            labels.append(f"{name.decode()} [{file_hash[:8]}]" if name else file_hash[:12])
+        texts = pd.Series([get_document(path).text() for path in file_paths], index=labels)
+
+        matrix = build_metrics_matrix(texts)
+        changes = compute_changes(matrix)
+
+        set_stage("commentary")
+        commentary = llm.call(build_comparison_prompt(query, matrix, changes))
+
+        redis_conn.hset(redis_key, mapping={
+            "status": "finished",
+            "result": json.dumps({
+                "documents": dict(zip(labels, file_hashes)),
+                "metrics_note": "Figures are extracted heuristically from the document text and may be inaccurate.",
+                "metrics": _json_table(matrix),
+                "changes": _json_table(changes),
+                "commentary": str(commentary),
+            }),
+            "completed_at": datetime.now().isoformat()
+        })
+        set_stage("completed")
+        logger.info(f"✅ Comparison {compare_id} finished successfully")
+
+    except Exception as e:
+        logger.error(f"❌ Comparison {compare_id} failed: {e}\n{traceback.format_exc()}")
+        redis_conn.hset(redis_key, mapping={
+            "status": "failed",
+            "result": "",
+            "message": str(e),
+            "failed_at": datetime.now().isoformat()
+        })
+    finally:
+        from fleet import record_completion
+        for path in file_paths:
+            release_document(path)
+        record_completion(redis_conn, compare_id)
@@ -0,0 +1,304 @@
+# document.py
+"""
+Compact, shared in-memory representation of an extracted financial document.
+
+Page text is extracted once, written next to the PDF as a UTF-8 sidecar
+(`<name>.txt`) with a small page index (`<name>.index.json`), and then
+memory-mapped. Tools and agents receive a `FinancialDocument` handle and
+read page or section views from the shared buffer instead of passing
+multi-megabyte `str` copies around.
+
+Extraction starts with a one-pass PyMuPDF triage that classifies each page as
+`text`, `table` or `image_only` and routes it to the matching extractor. The
+classification is stored in the page index so later tasks skip re-detection.
+"""
+import json
+import mmap
+import os
+import re
+import tempfile
+import threading
+from typing import Dict, Iterator, List, Tuple
+
+import fitz  # PyMuPDF
+
+
+TEXT_SUFFIX = ".txt"
+INDEX_SUFFIX = ".index.json"
+
+# Page kinds produced by triage
+PAGE_TEXT = "text"
+PAGE_TABLE = "table"
+PAGE_IMAGE_ONLY = "image_only"
+
+# A page mostly covered by images with little text is a scan; the few words
+# it has are usually just an overlaid header/footer ("Page 3 of 40")
+IMAGE_PAGE_COVERAGE = 0.6
+SCANNED_MAX_WORDS = 50
+# Share of numeric tokens above which a page is treated as table-dense
+TABLE_NUMERIC_RATIO = 0.35
+_NUMERIC_TOKEN = re.compile(r"^[(\-$€£]*[\d.,]*\d[\d.,]*[)%]*$")
+
+
+def _normalize_page(content: str) -> str:
+    """Strip a page and collapse repeated blank lines."""
+    content = content.strip()
+    while "\n\n" in content:
+        content = content.replace("\n\n", "\n")
+    return content + "\n"
+
+
+# ------------------------------
+# Page Triage
+# ------------------------------
+def _image_coverage(page: "fitz.Page") -> float:
+    """Share of the page area covered by images (overlaps counted once per image)."""
+    page_area = page.rect.get_area()
+    if not page_area:
+        return 0.0
+    covered = sum((fitz.Rect(info["bbox"]) & page.rect).get_area() for info in page.get_image_info())
+    return min(covered / page_area, 1.0)
+
+
+def classify_page(page: "fitz.Page") -> str:
+    """Cheaply classify a page from its word list and image placement."""
+    words = page.get_text("words")
+    if len(words) < SCANNED_MAX_WORDS and _image_coverage(page) >= IMAGE_PAGE_COVERAGE:
+        return PAGE_IMAGE_ONLY
+    if not words:
+        return PAGE_TEXT  # blank page, nothing to miss
+    numeric = sum(1 for word in words if _NUMERIC_TOKEN.match(word[4]))
+    if numeric / len(words) >= TABLE_NUMERIC_RATIO:
+        return PAGE_TABLE
+    return PAGE_TEXT
+
+
+def _extract_table_page(page: "fitz.Page") -> str:
+    """Render detected tables as pipe-separated rows, in reading order with the text.
+
+    Tables and the text blocks outside them are interleaved top to bottom, so
+    headings such as "(in millions)" stay directly above the table they describe.
+    """
+    tables = page.find_tables().tables
+    if not tables:
+        return page.get_text("text", sort=True)
+
+    parts = []
+    bboxes = []
+    for table in tables:
+        bbox = fitz.Rect(table.bbox)
+        bboxes.append(bbox)
+        rows = [" | ".join(cell.replace("\n", " ") if cell else "" for cell in row) for row in table.extract()]
+        parts.append((bbox.y0, bbox.x0, "\n".join(rows)))
+    for x0, y0, x1, y1, text, *_ in page.get_text("blocks"):
+        if not any(bbox.intersects(fitz.Rect(x0, y0, x1, y1)) for bbox in bboxes):
+            parts.append((y0, x0, text))
+
+    parts.sort(key=lambda part: (part[0], part[1]))
+    return "\n".join(text for _, _, text in parts)
+
+
+def extract_page(page: "fitz.Page") -> Tuple[str, str]:
+    """Triage a page and run the matching extractor; returns (kind, text)."""
+    kind = classify_page(page)
+    # Image-only pages still keep whatever text they have; they are only flagged
+    if kind == PAGE_TABLE:
+        return kind, _extract_table_page(page)
+    return kind, page.get_text("text", sort=True)
+
+
+class FinancialDocument:
+    """Read-only, memory-mapped page store for one extracted PDF."""
+
+    __slots__ = ("path", "text_path", "_file", "_buffer", "_view", "_offsets", "_kinds")
+
+    def __init__(self, path: str, text_path: str, offsets: List[int], kinds: List[str]):
+        self.path = path
+        self.text_path = text_path
+        self._offsets = offsets
+        self._kinds = kinds
+        self._file = open(text_path, "rb")
+        if offsets[-1]:
+            self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            # mmap refuses zero-length files (e.g. fully scanned PDFs)
+            self._buffer = b""
+        self._view = memoryview(self._buffer)
+
+    # ------------------------------
+    # Construction
+    # ------------------------------
+    @classmethod
+    def from_pdf(cls, path: str) -> "FinancialDocument":
+        """Open the extraction for `path`, extracting it first if missing or stale."""
+        base = os.path.splitext(path)[0]
+        text_path = base + TEXT_SUFFIX
+        index_path = base + INDEX_SUFFIX
+
+        index = cls._load_index(path, text_path, index_path)
+        if index is None:
+            index = cls._extract(path, text_path, index_path)
+        return cls(path, text_path, index["offsets"], index["kinds"])
+
+    @staticmethod
+    def _load_index(path: str, text_path: str, index_path: str):
+        """Return the cached page index if the sidecar is newer than the PDF."""
+        try:
+            if os.path.getmtime(index_path) < os.path.getmtime(path):
+                return None
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if os.path.getsize(text_path) != index["offsets"][-1]:
+                return None
+            # Indexes written before triage have no page kinds - re-extract
+            if len(index["kinds"]) != len(index["offsets"]) - 1:
+                return None
+            return index
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @staticmethod
+    def _extract(path: str, text_path: str, index_path: str) -> dict:
+        """Triage and extract every page to the sidecar file in a single pass.
+
+        Both sidecars are written to temp files and swapped in with os.replace,
+        so another process that has the old `.txt` memory-mapped keeps its
+        (unlinked) inode instead of seeing it truncated underneath the map.
+        """
+        directory = os.path.dirname(os.path.abspath(text_path))
+        offsets, kinds = [0], []
+        fd, tmp_text = tempfile.mkstemp(dir=directory, suffix=TEXT_SUFFIX + ".tmp")
+        tmp_index = None
+        try:
+            with fitz.open(path) as pdf, os.fdopen(fd, "wb") as out:
+                for page in pdf:
+                    kind, content = extract_page(page)
+                    encoded = _normalize_page(content).encode("utf-8") if content.strip() else b""
+                    out.write(encoded)
+                    offsets.append(offsets[-1] + len(encoded))
+                    kinds.append(kind)
+
+            index = {"offsets": offsets, "kinds": kinds}
+            fd, tmp_index = tempfile.mkstemp(dir=directory, suffix=INDEX_SUFFIX + ".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(index, f)
+        except BaseException:
+            for tmp in (tmp_text, tmp_index):
+                if tmp is not None and os.path.exists(tmp):
+                    os.unlink(tmp)
+            raise
+
+        os.replace(tmp_text, text_path)
+        # Index is swapped in last so a crash mid-extraction is never reused
+        os.replace(tmp_index, index_path)
+        return index
+
+    # ------------------------------
+    # Views
+    # ------------------------------
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    @property
+    def nbytes(self) -> int:
+        return self._offsets[-1]
+
+    def page(self, index: int) -> memoryview:
+        """Zero-copy view of one page's UTF-8 bytes.
+
+        Views pin the mapping; drop them when done so `close()` can unmap.
+        """
+        return self._view[self._offsets[index]:self._offsets[index + 1]]
+
+    def section(self, start: int, stop: int) -> memoryview:
+        """Zero-copy view of pages `start` (inclusive) to `stop` (exclusive)."""
+        return self._view[self._offsets[start]:self._offsets[stop]]
+
+    def page_kind(self, index: int) -> str:
+        return self._kinds[index]
+
+    def pages_without_text(self) -> List[int]:
+        """0-based indexes of pages flagged as scans without a usable text layer."""
+        return [i for i, kind in enumerate(self._kinds) if kind == PAGE_IMAGE_ONLY]
+
+    def page_text(self, index: int) -> str:
+        return str(self.page(index), "utf-8")
+
+    def iter_pages(self) -> Iterator[str]:
+        """Decode pages one at a time so only a single page is materialized."""
+        for index in range(len(self)):
+            yield self.page_text(index)
+
+    def text(self) -> str:
+        """Full report as one string - only for handing the text to an LLM."""
+        return str(self._view, "utf-8")
+
+    def normalized_length(self) -> int:
+        """Length of the whitespace-normalized report, computed page by page."""
+        total, words = 0, 0
+        for page in self.iter_pages():
+            for token in page.split():
+                total += len(token)
+                words += 1
+        return total + max(words - 1, 0)
+
+    # ------------------------------
+    # Lifecycle
+    # ------------------------------
+    def close(self) -> None:
+        try:
+            self._view.release()
+            if isinstance(self._buffer, mmap.mmap):
+                self._buffer.close()
+        except BufferError:
+            # A caller still holds a page/section view; the map is closed when
+            # the last view is garbage-collected instead of failing the job.
+            pass
+        self._file.close()
+
+    def __enter__(self) -> "FinancialDocument":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# ------------------------------
+# Per-worker document registry
+# ------------------------------
+_documents: Dict[str, FinancialDocument] = {}
+_path_locks: Dict[str, threading.Lock] = {}
+_documents_lock = threading.Lock()
+
+
+def get_document(path: str) -> FinancialDocument:
+    """Return the shared handle for `path`, opening it on first use.
+
+    Concurrent callers for the same path wait on one extraction; different
+    paths extract in parallel.
+    """
+    key = os.path.abspath(path)
+    with _documents_lock:
+        document = _documents.get(key)
+        if document is not None:
+            return document
+        path_lock = _path_locks.setdefault(key, threading.Lock())
+
+    with path_lock:
+        with _documents_lock:
+            document = _documents.get(key)
+        if document is None:
+            document = FinancialDocument.from_pdf(path)
+            with _documents_lock:
+                _documents[key] = document
+        return document
+
+
+def release_document(path: str) -> None:
+    """Close and forget the shared handle for `path` (call when a job ends)."""
+    # The path lock stays registered: a thread may be waiting on it, and a
+    # fresh lock would let a third caller extract the same path concurrently.
+    with _documents_lock:
+        document = _documents.pop(os.path.abspath(path), None)
+    if document is not None:
+        document.close()
@@ -1,6 +1,7 @@
 from redis import Redis
 from rq import Queue
 from tasks import process_financial_report  # <-- your main task
+from fleet import record_arrival
 
 redis_conn = Redis(host="localhost", port=6379, db=0)
 queue = Queue(connection=redis_conn)
@@ -12,4 +13,8 @@ if __name__ == "__main__":
         "data/financial_report.pdf",
         "financial_hash_123"
     )
+    try:
+        record_arrival(redis_conn, "financial_hash_123")
+    except Exception as e:
+        print(f"⚠️ Failed to record arrival: {e}")
     print(f"✅ Job {job.id} enqueued! Status: {job.get_status()}")
@@ -0,0 +1,232 @@
+# fleet.py
+"""
+Worker heartbeat registry and queue throughput signals.
+
+Each worker publishes a heartbeat hash (current job, stage, utilization) into
+Redis. The API reads the registry for `/workers` and combines arrival and
+completion timestamps into rates for `/queue/stats`, so an orchestrator can
+size the fleet from real throughput. Workers also reap peers whose heartbeat
+has gone stale and put their in-flight job back on the queue.
+"""
+from collections import deque
+from typing import List, Optional
+from rq import Queue, get_current_job
+from rq.job import Job, JobStatus
+from rq.registry import StartedJobRegistry
+import logging
+import os
+import socket
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+WORKERS_KEY = "fleet:workers"
+WORKER_KEY = "fleet:worker:{}"
+REAP_LOCK_KEY = "fleet:reap:{}"
+ARRIVALS_KEY = "fleet:arrivals"
+COMPLETIONS_KEY = "fleet:completions"
+
+HEARTBEAT_INTERVAL = int(os.getenv("FLEET_HEARTBEAT_INTERVAL", 5))
+# A worker that misses this many seconds of heartbeats is considered dead
+DEAD_AFTER = int(os.getenv("FLEET_DEAD_AFTER", HEARTBEAT_INTERVAL * 4))
+# Sliding window used for arrival/service rates and worker utilization
+RATE_WINDOW = int(os.getenv("FLEET_RATE_WINDOW", 300))
+
+
+# ------------------------------
+# Job-side helpers
+# ------------------------------
+def set_stage(stage: str) -> None:
+    """Record the running job's pipeline stage so the worker heartbeat can report it."""
+    job = get_current_job()
+    if job is not None:
+        job.meta["stage"] = stage
+        job.save_meta()
+
+
+def _record_event(redis_conn, key: str, member: str) -> None:
+    now = time.time()
+    pipe = redis_conn.pipeline()
+    pipe.zadd(key, {f"{member}:{now}": now})
+    pipe.zremrangebyscore(key, 0, now - RATE_WINDOW)
+    pipe.execute()
+
+
+def record_arrival(redis_conn, job_id: str) -> None:
+    _record_event(redis_conn, ARRIVALS_KEY, job_id)
+
+
+def record_completion(redis_conn, job_id: str) -> None:
+    _record_event(redis_conn, COMPLETIONS_KEY, job_id)
+
+
+# ------------------------------
+# Worker heartbeat
+# ------------------------------
+class HeartbeatThread(threading.Thread):
+    """Publishes this worker's state every HEARTBEAT_INTERVAL seconds.
+
+    `utilization` is the share of beats in the last RATE_WINDOW seconds that
+    saw a running job, so a worker that idled for hours and is now saturated
+    reports close to 1.0 within one window.
+    """
+
+    def __init__(self, redis_conn, worker):
+        super().__init__(name="fleet-heartbeat", daemon=True)
+        self.redis = redis_conn
+        self.worker = worker
+        self.key = WORKER_KEY.format(worker.name)
+        self.started_at = time.time()
+        self.busy_samples = deque(maxlen=max(RATE_WINDOW // HEARTBEAT_INTERVAL, 1))
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(HEARTBEAT_INTERVAL):
+            try:
+                self.beat()
+                reap_dead_workers(self.redis)
+            except Exception as e:
+                logger.error(f"❌ Heartbeat failed for worker {self.worker.name}: {e}")
+
+    def beat(self) -> None:
+        # The job runs in RQ's forked work horse, so read job state back from Redis
+        job_id = self.worker.get_current_job_id()
+        stage = ""
+        self.busy_samples.append(1 if job_id else 0)
+        if job_id:
+            try:
+                stage = Job.fetch(job_id, connection=self.redis).meta.get("stage", "")
+            except Exception:
+                pass
+
+        now = time.time()
+        self.redis.hset(self.key, mapping={
+            "name": self.worker.name,
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "state": "busy" if job_id else "idle",
+            "current_job": job_id or "",
+            "stage": stage,
+            "heartbeat": now,
+            "started_at": self.started_at,
+            "utilization": round(sum(self.busy_samples) / len(self.busy_samples), 4),
+        })
+        self.redis.sadd(WORKERS_KEY, self.worker.name)
+
+    def stop(self) -> None:
+        """Stop beating and remove this worker from the registry (clean shutdown)."""
+        self._stop_event.set()
+        # Let an in-flight beat() finish first, or it re-creates the entry
+        # after the delete and leaves a ghost worker for peers to reap
+        self.join(timeout=HEARTBEAT_INTERVAL * 2)
+        self.redis.delete(self.key)
+        self.redis.srem(WORKERS_KEY, self.worker.name)
+
+
+def reap_dead_workers(redis_conn) -> List[str]:
+    """Requeue jobs held by workers with stale heartbeats; returns requeued job ids.
+
+    Only jobs still in STARTED state are requeued - a job that finished or
+    failed between the last heartbeat and the worker's death is left alone.
+    Known gap: if the worker parent is SIGKILLed while its forked work horse
+    keeps running, the job still looks STARTED and will run a second time.
+    Both job functions overwrite their result hash, so the duplicate run is
+    wasted work rather than a wrong result.
+    """
+    requeued = []
+    now = time.time()
+    for raw_name in redis_conn.smembers(WORKERS_KEY):
+        name = raw_name.decode()
+        data = redis_conn.hgetall(WORKER_KEY.format(name))
+        if data and now - float(data[b"heartbeat"]) < DEAD_AFTER:
+            continue
+        # Only one live worker reaps a given dead peer
+        if not redis_conn.set(REAP_LOCK_KEY.format(name), "1", nx=True, ex=60):
+            continue
+
+        job_id = data.get(b"current_job", b"").decode() if data else ""
+        if job_id:
+            try:
+                job = Job.fetch(job_id, connection=redis_conn)
+                status = job.get_status()
+                if status == JobStatus.STARTED:
+                    registry = StartedJobRegistry(job.origin, connection=redis_conn)
+                    if hasattr(registry, "remove_executions"):
+                        # rq >= 2.0 tracks started jobs per execution
+                        registry.remove_executions(job)
+                    else:
+                        registry.remove(job)
+                    Queue(job.origin, connection=redis_conn).enqueue_job(job)
+                    requeued.append(job_id)
+                    logger.info(f"♻️ Requeued job {job_id} from dead worker {name}")
+                else:
+                    logger.info(f"Skipped requeue of job {job_id} from dead worker {name}: status {status}")
+            except Exception as e:
+                logger.error(f"❌ Failed to requeue job {job_id} from dead worker {name}: {e}")
+
+        redis_conn.delete(WORKER_KEY.format(name))
+        redis_conn.srem(WORKERS_KEY, name)
+    return requeued
+
+
+# ------------------------------
+# API-side summaries
+# ------------------------------
+def list_workers(redis_conn) -> List[dict]:
+    workers = []
+    now = time.time()
+    for raw_name in sorted(redis_conn.smembers(WORKERS_KEY)):
+        data = redis_conn.hgetall(WORKER_KEY.format(raw_name.decode()))
+        if not data:
+            continue
+        decoded = {k.decode(): v.decode() for k, v in data.items()}
+        age = now - float(decoded["heartbeat"])
+        decoded["heartbeat_age_seconds"] = round(age, 1)
+        decoded["utilization"] = float(decoded["utilization"])
+        if age >= DEAD_AFTER:
+            decoded["state"] = "dead"
+        workers.append(decoded)
+    return workers
+
+
+def fleet_summary(redis_conn) -> dict:
+    """Fleet capacity: how many workers are alive, busy and idle."""
+    workers = list_workers(redis_conn)
+    alive = [w for w in workers if w["state"] != "dead"]
+    busy = [w for w in alive if w["state"] == "busy"]
+    return {
+        "total_workers": len(alive),
+        "busy_workers": len(busy),
+        "idle_workers": len(alive) - len(busy),
+        "dead_workers": len(workers) - len(alive),
+        "average_utilization": round(sum(w["utilization"] for w in alive) / len(alive), 4) if alive else 0.0,
+        "workers": workers,
+    }
+
+
+def throughput_stats(redis_conn, queue_length: int) -> dict:
+    """Arrival/service rates over RATE_WINDOW and the resulting queue drain estimate."""
+    now = time.time()
+    window_start = now - RATE_WINDOW
+    arrivals = redis_conn.zcount(ARRIVALS_KEY, window_start, now)
+    completions = redis_conn.zcount(COMPLETIONS_KEY, window_start, now)
+
+    arrival_rate = arrivals / RATE_WINDOW
+    service_rate = completions / RATE_WINDOW
+    drain_rate = service_rate - arrival_rate
+
+    drain_seconds: Optional[float]
+    if queue_length == 0:
+        drain_seconds = 0.0
+    elif drain_rate > 0:
+        drain_seconds = round(queue_length / drain_rate, 1)
+    else:
+        drain_seconds = None  # queue is not shrinking at the current rates
+
+    return {
+        "rate_window_seconds": RATE_WINDOW,
+        "arrival_rate_per_min": round(arrival_rate * 60, 3),
+        "service_rate_per_min": round(service_rate * 60, 3),
+        "estimated_drain_seconds": drain_seconds,
+    }
@@ -6,8 +6,15 @@ from rq import Queue
 from crewai import Crew, Process
 from agents import financial_analyst,investment_advisor,risk_assessor,verifier
 from task import analyze_financial_document
+from document import release_document
+from fleet import set_stage, record_arrival, record_completion, fleet_summary, throughput_stats
+from compare import process_comparison
+from pydantic import BaseModel
+from typing import List
 import hashlib
+import json
 import os
+import re
 import logging
 from datetime import datetime
 
@@ -34,6 +41,12 @@ app.add_middleware(
 redis_conn = Redis(host="localhost", port=6379, db=0)
 queue = Queue(connection=redis_conn)
 
+MAX_COMPARE_DOCUMENTS = 8
+
+class CompareRequest(BaseModel):
+    file_hashes: List[str]
+    query: str = "Compare the key financial metrics across these documents"
+
 # ===============================
 # Utility Functions
 # ===============================
@@ -57,7 +70,9 @@ def process_financial_document(query: str, file_path: str, job_id: str):
     try:
         logger.info(f"🔎 Starting analysis for job {job_id}")
 
+        set_stage("analysis_running")
         result = run_crew(query, file_path)
+        set_stage("completed")
 
         # Save result to Redis
         redis_conn.hset(redis_key, mapping={
@@ -76,6 +91,10 @@ def process_financial_document(query: str, file_path: str, job_id: str):
             "message": str(e),
             "failed_at": datetime.now().isoformat()
         })
+    finally:
+        # Drop this job's memory-mapped extraction from the worker
+        release_document(file_path)
+        record_completion(redis_conn, job_id)
 
 # ===============================
 # Endpoints
@@ -156,6 +175,12 @@ async def upload_financial_document(
         })
         raise HTTPException(status_code=500, detail=f"Failed to enqueue job: {str(e)}")
 
+    # The job is already queued; a metrics failure must not report it as failed
+    try:
+        record_arrival(redis_conn, file_hash)
+    except Exception as e:
+        logger.warning(f"⚠️ Failed to record arrival for job {file_hash}: {e}")
+
     return JSONResponse(content={
         "status": "processing",
         "message": "Job enqueued for analysis.",
@@ -163,6 +188,82 @@ async def upload_financial_document(
     })
 
 
+@app.post("/compare")
+async def compare_financial_documents(request: CompareRequest):
+    """Compare metrics across already-uploaded documents in one background job."""
+    file_hashes = [h.strip().lower() for h in request.file_hashes]
+    if not 2 <= len(file_hashes) <= MAX_COMPARE_DOCUMENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Provide between 2 and {MAX_COMPARE_DOCUMENTS} file hashes to compare."
+        )
+    if len(set(file_hashes)) != len(file_hashes):
+        raise HTTPException(status_code=400, detail="Each document can only be compared once; remove duplicate hashes.")
+    if any(not re.fullmatch(r"[0-9a-f]{64}", h) for h in file_hashes):
+        raise HTTPException(status_code=400, detail="File hashes must be SHA-256 hex digests returned by /upload.")
+
+    file_paths = [os.path.join("data", f"{h}.pdf") for h in file_hashes]
+    missing = [h for h, path in zip(file_hashes, file_paths) if not os.path.exists(path)]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Documents not found, upload them first: {missing}")
+
+    # Order matters (e.g. Q1..Q4), so the id is built from the ordered hashes + query
+    query = request.query.strip()
+    compare_id = "compare_" + hashlib.sha256(
+        ("|".join(file_hashes) + "|" + query).encode()
+    ).hexdigest()
+    redis_key = f"finance_result:{compare_id}"
+
+    # Check cache
+    if redis_conn.exists(redis_key):
+        status = redis_conn.hget(redis_key, "status").decode()
+        logger.info(f"Cache hit: Comparison {compare_id} already exists with status {status}")
+        if status in ("finished", "processing"):
+            return JSONResponse(content={
+                "status": "success" if status == "finished" else "processing",
+                "message": "Result found in cache." if status == "finished" else "Job is still processing.",
+                "job_id": compare_id
+            })
+
+    redis_conn.hset(redis_key, mapping={
+        "status": "processing",
+        "result": "",
+        "message": "Comparison is being processed.",
+        "started_at": datetime.now().isoformat(),
+        "file_hashes": ",".join(file_hashes)
+    })
+
+    try:
+        job = queue.enqueue(
+            process_comparison,
+            query,
+            file_hashes,
+            file_paths,
+            compare_id,
+            job_timeout="15m"
+        )
+        logger.info(f"📌 Comparison {compare_id} enqueued successfully (RQ id: {job.id})")
+    except Exception as e:
+        redis_conn.hset(redis_key, mapping={
+            "status": "failed",
+            "result": "",
+            "message": f"Failed to enqueue job: {str(e)}",
+            "failed_at": datetime.now().isoformat()
+        })
+        raise HTTPException(status_code=500, detail=f"Failed to enqueue job: {str(e)}")
+
+    try:
+        record_arrival(redis_conn, compare_id)
+    except Exception as e:
+        logger.warning(f"⚠️ Failed to record arrival for comparison {compare_id}: {e}")
+
+    return JSONResponse(content={
+        "status": "processing",
+        "message": "Comparison enqueued for analysis.",
+        "job_id": compare_id
+    })
+
+
 @app.get("/status/{job_id}")
 async def get_status(job_id: str):
     """Check the status/result of a job."""
@@ -187,12 +288,14 @@ async def get_status(job_id: str):
 
 @app.get("/queue/stats")
 async def queue_stats():
-    """Queue statistics."""
+    """Queue statistics plus arrival/service rates for autoscaling."""
     try:
+        queue_length = len(queue)
         return JSONResponse(content={
-            "queue_length": len(queue),
+            "queue_length": queue_length,
             "failed_jobs": queue.failed_job_registry.count,
             "finished_jobs": queue.finished_job_registry.count,
+            **throughput_stats(redis_conn, queue_length),
             "status": "healthy"
         })
     except Exception as e:
@@ -202,6 +305,18 @@ async def queue_stats():
         }, status_code=500)
 
 
+@app.get("/workers")
+async def workers():
+    """Worker fleet capacity from the heartbeat registry."""
+    try:
+        return JSONResponse(content=fleet_summary(redis_conn))
+    except Exception as e:
+        return JSONResponse(content={
+            "status": "error",
+            "message": str(e)
+        }, status_code=500)
+
+
 @app.get("/health")
 async def health_check():
     """Health check for API + Redis + Queue."""
@@ -227,8 +342,10 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "upload": "/upload - POST - Upload financial PDF",
+            "compare": "/compare - POST - Compare metrics across uploaded PDFs",
             "status": "/status/{job_id} - GET - Check job status",
             "queue_stats": "/queue/stats - GET - Queue statistics",
+            "workers": "/workers - GET - Worker fleet status",
             "health": "/health - GET - Health check"
         }
     })
@@ -0,0 +1,218 @@
+# search_cache.py
+"""
+Caching, coalescing wrapper around the web search tool.
+
+Queries are normalized and cached with a TTL. Identical searches issued at the
+same time are collapsed into one upstream call - within a worker via a shared
+future, across workers via a short Redis lock. The Redis backend is shared by
+the whole fleet; the local backend is an in-process stub with the same
+contract, for offline runs and tests.
+"""
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, Type
+from pydantic import BaseModel, Field, PrivateAttr
+from crewai.tools import BaseTool
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------------------
+# Query Normalization
+# ------------------------------
+def normalize_query(query: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    query = " ".join(query.lower().split())
+    return re.sub(r"[\s?.!,;:]+$", "", query)
+
+
+def cache_key(query: str) -> str:
+    return hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+
+
+# ------------------------------
+# Cache Backends
+# ------------------------------
+class LocalSearchCacheBackend:
+    """In-process stub backend: same contract as Redis, no network."""
+
+    def __init__(self):
+        self._values: Dict[str, tuple] = {}
+        self._locks: Dict[str, float] = {}
+        self._mutex = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._mutex:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._values[key]
+                return None
+            return value
+
+    def set(self, key: str, value: str, ttl: int) -> None:
+        with self._mutex:
+            self._values[key] = (value, time.monotonic() + ttl)
+
+    def acquire(self, key: str, ttl: int) -> bool:
+        with self._mutex:
+            now = time.monotonic()
+            if self._locks.get(key, 0) > now:
+                return False
+            self._locks[key] = now + ttl
+            return True
+
+    def release(self, key: str) -> None:
+        with self._mutex:
+            self._locks.pop(key, None)
+
+
+class RedisSearchCacheBackend:
+    """Fleet-wide backend: results and search locks live in Redis."""
+
+    def __init__(self, redis_conn, prefix: str = "search_cache:"):
+        self.redis = redis_conn
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.redis.get(self.prefix + key)
+        return value.decode() if value is not None else None
+
+    def set(self, key: str, value: str, ttl: int) -> None:
+        self.redis.set(self.prefix + key, value, ex=ttl)
+
+    def acquire(self, key: str, ttl: int) -> bool:
+        return bool(self.redis.set(f"{self.prefix}lock:{key}", "1", nx=True, ex=ttl))
+
+    def release(self, key: str) -> None:
+        self.redis.delete(f"{self.prefix}lock:{key}")
+
+
+def make_search_backend():
+    """Pick the backend from SEARCH_CACHE_BACKEND (`redis` by default, or `local`)."""
+    if os.getenv("SEARCH_CACHE_BACKEND", "redis").lower() == "local":
+        return LocalSearchCacheBackend()
+
+    from redis import Redis
+    return RedisSearchCacheBackend(Redis(
+        host=os.getenv("REDIS_HOST", "localhost"),
+        port=int(os.getenv("REDIS_PORT", 6379)),
+        db=int(os.getenv("REDIS_DB", 0))
+    ))
+
+
+# ------------------------------
+# Cached Search Tool
+# ------------------------------
+class SearchCacheUnavailable(Exception):
+    """The cache backend failed; the search falls back to an uncached call."""
+
+
+class CachedSearchToolInput(BaseModel):
+    search_query: str = Field(description="Mandatory search query you want to use to search the internet.")
+
+
+class CachedSearchTool(BaseTool):
+    name: str = "Search the internet"
+    description: str = (
+        "Searches the internet for a query and returns the results. "
+        "Repeated searches for the same query are served from a shared cache."
+    )
+    args_schema: Type[BaseModel] = CachedSearchToolInput
+
+    search_tool: Any
+    backend: Any
+    ttl: int = int(os.getenv("SEARCH_CACHE_TTL", 6 * 60 * 60))
+    lock_timeout: int = 30
+    poll_interval: float = 0.25
+
+    _inflight: Dict[str, Future] = PrivateAttr(default_factory=dict)
+    _inflight_lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    def _run(self, search_query: str) -> Any:
+        key = cache_key(search_query)
+        try:
+            cached = self._backend("get", key)
+            if cached is not None:
+                return json.loads(cached)
+        except SearchCacheUnavailable:
+            return self._search_uncached(search_query)
+
+        # Coalesce identical in-flight searches inside this worker
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+        if not leader:
+            return future.result()
+
+        try:
+            try:
+                result = self._search_once(key, search_query)
+            except SearchCacheUnavailable:
+                result = self._search_uncached(search_query)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _search_once(self, key: str, search_query: str) -> Any:
+        """Run the upstream search unless another worker is already running it."""
+        deadline = time.monotonic() + self.lock_timeout
+        # Retry the lock while waiting: if the holder fails without storing a
+        # result it releases the lock, and the next follower takes over at once.
+        while not self._backend("acquire", key, self.lock_timeout):
+            cached = self._backend("get", key)
+            if cached is not None:
+                return json.loads(cached)
+            if time.monotonic() >= deadline:
+                # Lock holder is stuck - search ourselves
+                return self._search_and_store(key, search_query)
+            time.sleep(self.poll_interval)
+
+        try:
+            cached = self._backend("get", key)
+            if cached is not None:
+                return json.loads(cached)
+            return self._search_and_store(key, search_query)
+        finally:
+            try:
+                self.backend.release(key)
+            except Exception as e:
+                # The lock expires on its own after lock_timeout
+                logger.warning(f"⚠️ Search cache release failed: {e}")
+
+    def _search_and_store(self, key: str, search_query: str) -> Any:
+        result = self.search_tool.run(search_query=search_query)
+        payload = json.dumps(result, default=str)
+        try:
+            self.backend.set(key, payload, self.ttl)
+        except Exception as e:
+            logger.warning(f"⚠️ Search cache store failed, result not cached: {e}")
+        return json.loads(payload)
+
+    def _search_uncached(self, search_query: str) -> Any:
+        return self.search_tool.run(search_query=search_query)
+
+    def _backend(self, method: str, *args) -> Any:
+        """Call the cache backend; any failure becomes SearchCacheUnavailable."""
+        try:
+            return getattr(self.backend, method)(*args)
+        except Exception as e:
+            logger.warning(f"⚠️ Search cache unavailable ({method}), searching uncached: {e}")
+            raise SearchCacheUnavailable(str(e)) from e
+
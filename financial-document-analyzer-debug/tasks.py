@@ -29,6 +29,7 @@ def process_financial_report(query: str, file_path: str, file_hash: str):
         from agents import financial_analyst, verifier
         from task import analyze_financial_document, investment_analysis, risk_assessment
         from redis import Redis
+        from fleet import set_stage
 
         logger.info(f"🔄 Starting financial analysis for job {file_hash}")
         logger.info(f"📋 Query: {query}")
@@ -51,6 +52,7 @@ def process_financial_report(query: str, file_path: str, file_hash: str):
             "message": "Creating analysis crew...",
             "current_stage": "crew_creation"
         })
+        set_stage("crew_creation")
         
         crew = Crew(
             agents=[financial_analyst, verifier],
@@ -64,6 +66,7 @@ def process_financial_report(query: str, file_path: str, file_hash: str):
             "message": "Running analysis...",
             "current_stage": "analysis_running"
         })
+        set_stage("analysis_running")
 
         logger.info(f"🚀 Starting crew analysis for job {file_hash}")
         result = crew.kickoff(inputs={"query": query, "file_path": file_path})
@@ -108,6 +111,18 @@ def process_financial_report(query: str, file_path: str, file_hash: str):
 
         raise e
 
+    finally:
+        # Drop this job's memory-mapped extraction from the worker
+        from document import release_document
+        release_document(file_path)
+
+        try:
+            from redis import Redis
+            from fleet import record_completion
+            record_completion(Redis(host="localhost", port=6379, db=0), file_hash)
+        except Exception as redis_error:
+            logger.error(f"❌ Failed to record job completion: {str(redis_error)}")
+
 
 def test_redis_connection():
     """
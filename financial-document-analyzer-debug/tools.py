@@ -1,19 +1,44 @@
 # Importing libraries and files
 from typing import Type
 from pydantic import BaseModel, Field
-from langchain_community.document_loaders import PyPDFLoader
 from crewai.tools import BaseTool
 from crewai_tools.tools import SerperDevTool
+from concurrent.futures import ThreadPoolExecutor
 import asyncio
 import os
 from dotenv import load_dotenv
+from document import get_document
+from search_cache import CachedSearchTool, make_search_backend
 load_dotenv()
 
 
+# ------------------------------
+# Shared PDF I/O Pool
+# ------------------------------
+# One bounded pool per worker process: parallel agents queue their blocking
+# PDF reads here instead of each spinning up its own event loop.
+# CrewAI calls only `_run` (sync, via run_blocking); callers already inside an
+# event loop await the tools' async methods (read_data_tool,
+# analyze_investment_tool, create_risk_assessment_tool) instead.
+PDF_IO_WORKERS = int(os.getenv("PDF_IO_WORKERS", 4))
+pdf_io_pool = ThreadPoolExecutor(max_workers=PDF_IO_WORKERS, thread_name_prefix="pdf-io")
+
+
+def run_blocking(func, *args):
+    """Run blocking work on the shared pool and wait for it (sync callers)."""
+    return pdf_io_pool.submit(func, *args).result()
+
+
+async def arun_blocking(func, *args):
+    """Await blocking work on the shared pool without blocking the running loop."""
+    return await asyncio.get_running_loop().run_in_executor(pdf_io_pool, func, *args)
+
+
 # ------------------------------
 # Creating Search Tool
 # ------------------------------
-search_tool = SerperDevTool()
+# Cached + coalesced across workers; set SEARCH_CACHE_BACKEND=local to run offline
+search_tool = CachedSearchTool(search_tool=SerperDevTool(), backend=make_search_backend())
 
 
 # ------------------------------
@@ -29,30 +54,34 @@ class FinancialDocumentTool(BaseTool):
     args_schema: Type[BaseModel] = FinancialDocumentToolInput
 
     def _run(self, path: str) -> str:
-        return asyncio.run(self.read_data_tool(path=path))
+        return run_blocking(self._read, path)
 
     async def read_data_tool(self, path: str) -> str:
         """Tool to read data from a financial PDF file."""
-        docs = PyPDFLoader(file_path=path).load()
+        return await arun_blocking(self._read, path)
 
-        full_report = ""
-        for data in docs:
-            content = data.page_content.strip()
-            # Normalize extra line breaks
-            while "\n\n" in content:
-                content = content.replace("\n\n", "\n")
-            full_report += content + "\n"
+    @staticmethod
+    def _read(path: str) -> str:
+        # Extraction is shared per worker; only the LLM-bound copy is a str
+        document = get_document(path)
+        report = document.text()
 
-        return full_report
+        # Don't let scanned pages silently disappear from the analysis
+        missing = document.pages_without_text()
+        if missing:
+            pages = ", ".join(str(i + 1) for i in missing)
+            report += (
+                f"\n[Note: {len(missing)} of {len(document)} pages are scanned images without a "
+                f"usable text layer (not OCR'd, content may be missing): pages {pages}]\n"
+            )
+        return report
 
 
 # ------------------------------
 # Investment Analysis Tool
 # ------------------------------
 class InvestmentToolInput(BaseModel):
-    financial_document_data: str = Field(
-        description="Financial document data to analyze for investments."
-    )
+    path: str = Field(description="Path of the financial PDF file to analyze for investments.")
 
 
 class InvestmentTool(BaseTool):
@@ -60,18 +89,22 @@ class InvestmentTool(BaseTool):
     description: str = "Analyzes financial document data to provide investment insights."
     args_schema: Type[BaseModel] = InvestmentToolInput
 
-    def _run(self, financial_document_data: str) -> str:
-        return asyncio.run(self.analyze_investment_tool(financial_document_data=financial_document_data))
+    def _run(self, path: str) -> str:
+        return run_blocking(self._analyze, path)
 
-    async def analyze_investment_tool(self, financial_document_data: str) -> str:
+    async def analyze_investment_tool(self, path: str) -> str:
         """Analyze financial document data for investment opportunities."""
-        processed_data = " ".join(financial_document_data.split())
+        return await arun_blocking(self._analyze, path)
+
+    @staticmethod
+    def _analyze(path: str) -> str:
+        document = get_document(path)
 
         # 🔑 Placeholder logic for now
         # TODO: Add valuation ratios, trend analysis, sector comparison, etc.
         return (
             f"📊 Investment analysis placeholder.\n"
-            f"Processed {len(processed_data)} characters of financial data.\n"
+            f"Processed {document.normalized_length()} characters of financial data.\n"
             f"Further detailed logic (ROI, growth, sector analysis) to be implemented."
         )
 
@@ -80,9 +113,7 @@ class InvestmentTool(BaseTool):
 # Risk Assessment Tool
 # ------------------------------
 class RiskToolInput(BaseModel):
-    financial_document_data: str = Field(
-        description="Financial document data to analyze for risks."
-    )
+    path: str = Field(description="Path of the financial PDF file to analyze for risks.")
 
 
 class RiskTool(BaseTool):
@@ -90,17 +121,21 @@ class RiskTool(BaseTool):
     description: str = "Analyzes financial document data to provide risk assessment."
     args_schema: Type[BaseModel] = RiskToolInput
 
-    def _run(self, financial_document_data: str) -> str:
-        return asyncio.run(self.create_risk_assessment_tool(financial_document_data=financial_document_data))
+    def _run(self, path: str) -> str:
+        return run_blocking(self._analyze, path)
 
-    async def create_risk_assessment_tool(self, financial_document_data: str) -> str:
+    async def create_risk_assessment_tool(self, path: str) -> str:
         """Create a risk assessment from financial document data."""
-        processed_data = " ".join(financial_document_data.split())
+        return await arun_blocking(self._analyze, path)
+
+    @staticmethod
+    def _analyze(path: str) -> str:
+        document = get_document(path)
 
         # 🔑 Placeholder logic for now
         # TODO: Add credit risk, liquidity risk, volatility, debt ratio, etc.
         return (
             f"⚠️ Risk assessment placeholder.\n"
-            f"Processed {len(processed_data)} characters of financial data.\n"
+            f"Processed {document.normalized_length()} characters of financial data.\n"
             f"Further detailed logic (market risk, operational risk, financial ratios) to be implemented."
         )
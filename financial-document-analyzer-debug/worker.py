@@ -14,6 +14,8 @@ redis_conn = Redis(
     db=int(os.getenv("REDIS_DB", 0))
 )
 
+from fleet import HeartbeatThread
+
 # Queue setup
 queue = Queue(connection=redis_conn)
 
@@ -25,5 +27,12 @@ if __name__ == "__main__":
     # Create worker instance
     worker = Worker([queue], connection=redis_conn)
 
+    # Publish heartbeat/current job/utilization to the fleet registry
+    heartbeat = HeartbeatThread(redis_conn, worker)
+    heartbeat.start()
+
     print("👷 Worker started. Waiting for jobs...")
-    worker.work()
+    try:
+        worker.work()
+    finally:
+        heartbeat.stop()